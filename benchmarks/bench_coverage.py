@@ -0,0 +1,63 @@
+# SPDX-FileCopyrightText: 2023 Carnegie Mellon University - Satyalab
+#
+# SPDX-License-Identifier: GPL-2.0-only
+
+"""Planning time and route length of coverage routes and waypoint ordering.
+
+Run from the repository root: python benchmarks/bench_coverage.py
+"""
+
+import logging
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from project.planning.CoveragePlanner import boustrophedon, order_waypoints, route_length, to_local
+
+ORIGIN = (40.44, -79.94)
+ALTITUDE = 30
+GIMBAL_PITCH = -90
+SQUARES_KM = [0.5, 2, 5]
+WAYPOINT_COUNTS = [200, 1000, 3000]
+
+
+def square(km):
+    dlat = km * 1000 / 111320
+    dlng = dlat / math.cos(math.radians(ORIGIN[0]))
+    lat, lng = ORIGIN
+    return [{"lat": lat, "lng": lng}, {"lat": lat, "lng": lng + dlng},
+            {"lat": lat + dlat, "lng": lng + dlng}, {"lat": lat + dlat, "lng": lng}]
+
+
+def length_km(coords):
+    points = to_local([c["lat"] for c in coords], [c["lng"] for c in coords], ORIGIN)
+    return route_length(points) / 1000
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+    random.seed(1)
+    print(f"coverage at {ALTITUDE} m, gimbal pitch {GIMBAL_PITCH}, 20% overlap:")
+    for km in SQUARES_KM:
+        start = time.perf_counter()
+        coords = boustrophedon(square(km), ALTITUDE, GIMBAL_PITCH)
+        elapsed = time.perf_counter() - start
+        print(f"  {km} km square: {len(coords)} waypoints, {length_km(coords):.1f} km route, "
+              f"{elapsed * 1000:.1f} ms")
+
+    print("ordering random waypoints in a 2 km box:")
+    for n in WAYPOINT_COUNTS:
+        coords = [{"lat": ORIGIN[0] + random.random() * 0.02, "lng": ORIGIN[1] + random.random() * 0.02,
+                   "alt": 20} for _ in range(n)]
+        start = time.perf_counter()
+        ordered = order_waypoints(coords)
+        elapsed = time.perf_counter() - start
+        print(f"  {n}: {length_km(coords):.0f} km -> {length_km(ordered):.1f} km in {elapsed:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
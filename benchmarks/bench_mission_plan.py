@@ -0,0 +1,59 @@
+# SPDX-FileCopyrightText: 2023 Carnegie Mellon University - Satyalab
+#
+# SPDX-License-Identifier: GPL-2.0-only
+
+"""Load time of large mission plans: cold compile + store vs cached load.
+
+Run from the repository root: python benchmarks/bench_mission_plan.py
+"""
+
+import ast
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from interface.MissionPlan import load_plan
+from interface.Task import TaskArguments
+
+SIZES = [(10, 1000), (50, 2000)]
+REPEATS = 5
+
+
+def make_plan(n_tasks, n_waypoints):
+    tasks = {}
+    for t in range(n_tasks):
+        coords = str([{"lat": 40 + random.random(), "lng": -79 + random.random(), "alt": 15}
+                      for _ in range(n_waypoints)])
+        tasks[f"task{t}"] = TaskArguments(
+            "DetectTask", {"timeout": "300", "done": f"task{t + 1}"},
+            {"model": "coco", "lower_bound": "(0,0,0)", "upper_bound": "(255,255,255)",
+             "coords": coords, "gimbal_pitch": "-45"})
+    return tasks
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+    random.seed(0)
+    for n_tasks, n_waypoints in SIZES:
+        tasks = make_plan(n_tasks, n_waypoints)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            parse = timed(lambda: [ast.literal_eval(a.task_attributes["coords"]) for a in tasks.values()])
+            cold = timed(lambda: load_plan(tasks, cache_dir))
+            warm = min(timed(lambda: load_plan(tasks, cache_dir)) for _ in range(REPEATS))
+        print(f"{n_tasks} tasks x {n_waypoints} waypoints: literal_eval only {parse * 1000:.0f} ms, "
+              f"cold compile+store {cold * 1000:.0f} ms, cached load {warm * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
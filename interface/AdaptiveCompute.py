@@ -0,0 +1,157 @@
+# SPDX-FileCopyrightText: 2023 Carnegie Mellon University - Satyalab
+#
+# SPDX-License-Identifier: GPL-2.0-only
+
+import inspect
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class AdaptiveComputeController():
+    """Adjusts the inference rate a task requests from the compute backend at run time.
+
+    The task states how much it needs results right now with `set_demand` (0 to 1)
+    and reports every result it consumes with `observe`. The requested rate is
+    the demand interpolated between `min_rate` and `max_rate`, backed off while
+    results arrive later than `target_latency` beyond the frame interval. The rate
+    is pushed to the driver through `set_compute_rate` when the driver has one;
+    `period` paces the task's own result loop either way. Savings are only counted
+    for time the driver was actually running at a rate it accepted.
+    """
+
+    def __init__(self, control, min_rate=1.0, max_rate=20.0, target_latency=0.5,
+                 smoothing=0.2, hysteresis=0.1):
+        if not 0 < min_rate <= max_rate:
+            raise ValueError(f"invalid compute rate bounds [{min_rate}, {max_rate}]")
+        self.control = control
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.target_latency = target_latency
+        self.smoothing = smoothing
+        self.hysteresis = hysteresis
+
+        self.demand = 1.0
+        self.backoff = 1.0
+        self.rate = max_rate
+        # rate the driver accepted and is running at, None while it is unknown
+        self.applied_rate = None
+        self.driver_rate_control = getattr(control, "set_compute_rate", None) is not None
+        self.latency = None
+        self.result_interval = None
+        self.last_result_at = None
+
+        self.started_at = time.monotonic()
+        self.rate_changed_at = self.started_at
+        self.applied_time = 0.0
+        self.frames_requested = 0.0
+        self.frames_saved = 0.0
+        self.results = 0
+        self.adjustments = []
+
+    @property
+    def period(self):
+        return 1.0 / self.rate
+
+    async def start(self):
+        """Push the initial rate to the driver, after configure_compute."""
+        self._account()
+        await self._apply(self.rate)
+
+    async def set_demand(self, demand, reason=""):
+        demand = min(max(demand, 0.0), 1.0)
+        if demand == self.demand:
+            return
+        self.demand = demand
+        await self._update(reason or f"demand {demand:.2f}", force=True)
+
+    async def observe(self, latency=None):
+        """Record a consumed result and, if known, how long the task waited for it."""
+        now = time.monotonic()
+        self.results += 1
+        if self.last_result_at is not None:
+            self.result_interval = self._ewma(self.result_interval, now - self.last_result_at)
+        self.last_result_at = now
+        if latency is not None:
+            self.latency = self._ewma(self.latency, latency)
+            # AIMD: back off quickly while over the latency target, recover slowly.
+            # Waiting up to one frame interval is expected, only the excess is queueing.
+            if self.latency - self.period > self.target_latency:
+                self.backoff = max(self.backoff * 0.8, self.min_rate / self.max_rate)
+            else:
+                self.backoff = min(self.backoff + 0.05, 1.0)
+        await self._update("latency feedback")
+
+    def target_rate(self):
+        rate = (self.min_rate + self.demand * (self.max_rate - self.min_rate)) * self.backoff
+        return min(max(rate, self.min_rate), self.max_rate)
+
+    async def _update(self, reason, force=False):
+        rate = self.target_rate()
+        # hysteresis avoids churn, but never leave the rate just short of a bound
+        at_bound = rate in (self.min_rate, self.max_rate)
+        if rate == self.rate or (not force and not at_bound and abs(rate - self.rate) < self.hysteresis * self.rate):
+            return
+        self._account()
+        logger.info(f"**************compute rate {self.rate:.2f} -> {rate:.2f} Hz ({reason}, "
+                    f"latency={self._fmt(self.latency)}s, result interval={self._fmt(self.result_interval)}s)**************\n")
+        self.adjustments.append((time.monotonic() - self.started_at, self.rate, rate, reason))
+        self.rate = rate
+        await self._apply(rate)
+
+    async def _apply(self, rate):
+        if not self.driver_rate_control:
+            return
+        try:
+            result = self.control.set_compute_rate(rate)
+            if inspect.isawaitable(result):
+                result = await result
+        except Exception as e:
+            logger.error(f"compute driver failed to set rate {rate:.2f} Hz: {e}")
+            result = False
+        if result is False:
+            logger.info(f"**************compute driver rejected rate {rate:.2f} Hz**************\n")
+            # the driver kept whatever it was running at, which we no longer know
+            self.applied_rate = None
+        else:
+            self.applied_rate = rate
+
+    def _account(self):
+        now = time.monotonic()
+        elapsed = now - self.rate_changed_at
+        if self.applied_rate is not None:
+            self.applied_time += elapsed
+            self.frames_requested += self.applied_rate * elapsed
+            self.frames_saved += (self.max_rate - self.applied_rate) * elapsed
+        self.rate_changed_at = now
+
+    def _ewma(self, current, sample):
+        if current is None:
+            return sample
+        return (1 - self.smoothing) * current + self.smoothing * sample
+
+    @staticmethod
+    def _fmt(value):
+        return "n/a" if value is None else f"{value:.3f}"
+
+    def metrics(self):
+        self._account()
+        return {
+            "rate": self.rate,
+            # False when the driver has no set_compute_rate or rejected the last rate:
+            # the rate then only paces the task loop and nothing below counts as saved
+            "driver_rate_control": self.driver_rate_control,
+            "rate_applied": self.applied_rate is not None and self.applied_rate == self.rate,
+            "demand": self.demand,
+            "latency": self.latency,
+            "result_interval": self.result_interval,
+            "results": self.results,
+            "adjustments": len(self.adjustments),
+            "applied_time": self.applied_time,
+            "mean_applied_rate": self.frames_requested / self.applied_time if self.applied_time else None,
+            "frames_requested": self.frames_requested,
+            # frames not requested compared to running at max_rate while a rate was applied
+            "frames_saved": self.frames_saved,
+        }
@@ -0,0 +1,351 @@
+# SPDX-FileCopyrightText: 2023 Carnegie Mellon University - Satyalab
+#
+# SPDX-License-Identifier: GPL-2.0-only
+
+import ast
+import hashlib
+import importlib
+import json
+import logging
+import math
+import os
+import pickle
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Bump whenever the layout of the compiled records changes so that stale
+# cache entries are never unpickled into the new classes.
+PLAN_FORMAT_VERSION = 2
+
+TASK_PACKAGE = "project.task_defs"
+TRANSITION_PACKAGE = "project.transition_defs"
+
+
+class PlanCompileError(ValueError):
+    """Raised when a mission plan contains a task or transition that cannot be compiled."""
+    pass
+
+
+class Waypoint():
+    __slots__ = ("lat", "lng", "alt")
+
+    def __init__(self, lat, lng, alt):
+        self.lat = lat
+        self.lng = lng
+        self.alt = alt
+
+    def __getstate__(self):
+        return (self.lat, self.lng, self.alt)
+
+    def __setstate__(self, state):
+        _check_state(self, state, 3)
+        self.lat, self.lng, self.alt = state
+
+    def __eq__(self, other):
+        return isinstance(other, Waypoint) and self.__getstate__() == other.__getstate__()
+
+    def __repr__(self):
+        return f"Waypoint(lat={self.lat}, lng={self.lng}, alt={self.alt})"
+
+
+def _check_state(record, state, expected):
+    # a cached pickle from an older record layout must not load into the new one
+    if len(state) != expected:
+        raise ValueError(f"stale {type(record).__name__} state: {len(state)} values, expected {expected}")
+
+
+''' Converters '''
+def to_float(value):
+    if isinstance(value, bool):
+        raise ValueError(f"expected a number, got {value!r}")
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError(f"expected a finite number, got {value!r}")
+    return value
+
+
+def to_duration(value):
+    value = to_float(value)
+    if value < 0:
+        raise ValueError(f"expected a non-negative duration, got {value!r}")
+    return value
+
+
+def as_is(value):
+    # opaque values handed straight to the driver (e.g. compute filter bounds)
+    return value
+
+
+def to_str(value):
+    if not isinstance(value, str):
+        raise ValueError(f"expected a string, got {value!r}")
+    return value
+
+
+def to_waypoints(value, require_alt=True):
+    if isinstance(value, str):
+        value = ast.literal_eval(value)
+    if not isinstance(value, (list, tuple)):
+        raise ValueError(f"expected a list of coordinates, got {type(value).__name__}")
+    waypoints = []
+    for i, dest in enumerate(value):
+        try:
+            alt = to_float(dest["alt"]) if require_alt or "alt" in dest else None
+            waypoints.append(Waypoint(to_float(dest["lat"]), to_float(dest["lng"]), alt))
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"invalid waypoint {i}: {dest!r} ({e})") from e
+    return tuple(waypoints)
+
+
+def to_ground_waypoints(value):
+    # for tasks that only need a ground position (SetHome), alt may be left out
+    return to_waypoints(value, require_alt=False)
+
+
+class Field():
+    """Describes how one raw task attribute is converted into a record slot."""
+    __slots__ = ("name", "key", "convert", "required", "default")
+
+    def __init__(self, name, convert, key=None, required=True, default=None):
+        self.name = name
+        self.key = key if key is not None else name
+        self.convert = convert
+        self.required = required
+        self.default = default
+
+
+class TaskAttributes():
+    """Base class for the typed attribute records of a task.
+
+    Subclasses declare `__slots__` and describe in `fields` how each slot is
+    converted from the raw attributes.
+    """
+    __slots__ = ()
+    fields = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if "__slots__" not in cls.__dict__:
+            raise TypeError(f"{cls.__name__} must declare __slots__")
+
+    @classmethod
+    def from_raw(cls, raw):
+        if isinstance(raw, cls):
+            return raw
+        if raw is None:
+            raw = {}
+        record = cls.__new__(cls)
+        for field in cls.fields:
+            if field.key not in raw:
+                if field.required:
+                    raise PlanCompileError(f"{cls.__name__}: missing attribute '{field.key}'")
+                setattr(record, field.name, field.default)
+                continue
+            try:
+                setattr(record, field.name, field.convert(raw[field.key]))
+            except (ValueError, SyntaxError, TypeError) as e:
+                raise PlanCompileError(f"{cls.__name__}: invalid attribute '{field.key}': {e}") from e
+        return record
+
+    def __getstate__(self):
+        return tuple(getattr(self, field.name) for field in self.fields)
+
+    def __setstate__(self, state):
+        _check_state(self, state, len(self.fields))
+        for field, value in zip(self.fields, state):
+            setattr(self, field.name, value)
+
+    def __repr__(self):
+        values = ", ".join(f"{field.name}={getattr(self, field.name)!r}" for field in self.fields)
+        return f"{type(self).__name__}({values})"
+
+
+# transition name -> (transition class name, converter for its argument)
+TRANSITIONS = {
+    "timeout": ("TimerTransition", to_duration),
+    "object_detection": ("ObjectDetectionTransition", to_str),
+    "hsv_detection": ("HSVDetectionTransition", to_str),
+}
+
+
+def compile_transitions(raw):
+    if raw is None:
+        return {}
+    compiled = {}
+    for name, value in raw.items():
+        if name not in TRANSITIONS:
+            # unknown events (e.g. "done") are handled by the runtime, pass them through
+            compiled[name] = value
+            continue
+        try:
+            compiled[name] = TRANSITIONS[name][1](value)
+        except (ValueError, TypeError) as e:
+            raise PlanCompileError(f"invalid transition '{name}': {e}") from e
+    return compiled
+
+
+def resolve_class(package, class_name):
+    """Import `package.class_name` and return the class of the same name in that module."""
+    try:
+        module = importlib.import_module(f"{package}.{class_name}")
+        return getattr(module, class_name)
+    except (ImportError, AttributeError) as e:
+        raise PlanCompileError(f"cannot resolve {package}.{class_name}: {e}") from e
+
+
+def task_class_name(task_type):
+    # TaskType members map onto the <Name>Task modules in task_defs,
+    # plain strings name the class directly (e.g. "SetHome")
+    if hasattr(task_type, "name"):
+        return f"{task_type.name}Task"
+    if not isinstance(task_type, str):
+        raise PlanCompileError(f"invalid task type {task_type!r}")
+    return task_type
+
+
+class CompiledTask():
+    """A task whose class, attributes and transitions have been resolved and validated."""
+    __slots__ = ("task_id", "task_type", "task_class", "task_attributes",
+                 "transitions_attributes", "transition_classes")
+
+    def __init__(self, task_id, task_type, task_class, task_attributes,
+                 transitions_attributes, transition_classes):
+        self.task_id = task_id
+        self.task_type = task_type
+        self.task_class = task_class
+        self.task_attributes = task_attributes
+        self.transitions_attributes = transitions_attributes
+        self.transition_classes = transition_classes
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        _check_state(self, state, len(self.__slots__))
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+    def create(self, control, data, trigger_event_queue):
+        """Instantiate the task; the compiled record is passed in place of raw TaskArguments."""
+        return self.task_class(control, data, self.task_id, trigger_event_queue, self)
+
+
+def compile_attributes(task_class, raw):
+    attributes_class = getattr(task_class, "attributes_class", None)
+    if attributes_class is None:
+        # task_defs without a declared schema (e.g. DSL-generated ones) keep the raw dict
+        return raw
+    return attributes_class.from_raw(raw)
+
+
+def compile_task(task_id, task_args, task_package=TASK_PACKAGE, transition_package=TRANSITION_PACKAGE):
+    try:
+        task_class = resolve_class(task_package, task_class_name(task_args.task_type))
+        task_attributes = compile_attributes(task_class, task_args.task_attributes)
+        transitions_attributes = compile_transitions(task_args.transitions_attributes)
+        validate = getattr(task_class, "validate", None)
+        if validate is not None:
+            validate(task_attributes, transitions_attributes)
+        transition_classes = {name: resolve_class(transition_package, TRANSITIONS[name][0])
+                              for name in transitions_attributes if name in TRANSITIONS}
+    except PlanCompileError as e:
+        raise PlanCompileError(f"task {task_id}: {e}") from e
+    return CompiledTask(task_id, task_args.task_type, task_class, task_attributes,
+                        transitions_attributes, transition_classes)
+
+
+def compile_plan(tasks, task_package=TASK_PACKAGE, transition_package=TRANSITION_PACKAGE):
+    """Compile a mapping of task id -> TaskArguments, failing before takeoff on any bad task."""
+    return {task_id: compile_task(task_id, task_args, task_package, transition_package)
+            for task_id, task_args in tasks.items()}
+
+
+def _qualname(func):
+    return f"{func.__module__}.{func.__qualname__}"
+
+
+def schema_fingerprint(task_class):
+    """Everything about a task's attribute record that changes what compiling produces."""
+    attributes_class = getattr(task_class, "attributes_class", None)
+    if attributes_class is None:
+        return None
+    return [_qualname(attributes_class), list(attributes_class.__slots__),
+            [[f.name, f.key, f.required, repr(f.default), _qualname(f.convert)] for f in attributes_class.fields]]
+
+
+def plan_digest(tasks, task_package=TASK_PACKAGE):
+    """Content hash of the raw plan and of the schemas it compiles against, used as the cache key."""
+    schemas = {}
+    raw = {}
+    for task_id, args in tasks.items():
+        class_name = task_class_name(args.task_type)
+        if class_name not in schemas:
+            try:
+                schemas[class_name] = schema_fingerprint(resolve_class(task_package, class_name))
+            except PlanCompileError as e:
+                raise PlanCompileError(f"task {task_id}: {e}") from e
+        raw[str(task_id)] = [class_name, args.task_attributes, args.transitions_attributes]
+    transitions = {name: [class_name, _qualname(convert)] for name, (class_name, convert) in TRANSITIONS.items()}
+    encoded = json.dumps([PLAN_FORMAT_VERSION, schemas, transitions, raw],
+                         sort_keys=True, default=repr).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def default_cache_dir():
+    return os.environ.get("DRONEDSL_PLAN_CACHE",
+                          os.path.join(os.path.expanduser("~"), ".cache", "dronedsl", "plans"))
+
+
+def _is_private(st):
+    # only unpickle what nobody but us could have written
+    return st.st_uid == os.getuid() and not st.st_mode & 0o022
+
+
+def _private_cache_dir(cache_dir):
+    try:
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+        if _is_private(os.stat(cache_dir)):
+            return cache_dir
+        logger.info(f"**************plan cache {cache_dir} is not private to this user, not using it**************\n")
+    except OSError as e:
+        logger.info(f"**************could not create plan cache {cache_dir}: {e}**************\n")
+    return None
+
+
+def load_plan(tasks, cache_dir=None, task_package=TASK_PACKAGE, transition_package=TRANSITION_PACKAGE):
+    """Return the compiled plan for `tasks`, reusing the on-disk copy if the plan is unchanged."""
+    start = time.perf_counter()
+    digest = plan_digest(tasks, task_package)
+    cache_dir = _private_cache_dir(cache_dir if cache_dir is not None else default_cache_dir())
+    if cache_dir is None:
+        return compile_plan(tasks, task_package, transition_package)
+    path = os.path.join(cache_dir, f"{digest}.pickle")
+
+    try:
+        with open(path, "rb") as f:
+            if not _is_private(os.fstat(f.fileno())):
+                raise PermissionError("cache entry is not private to this user")
+            plan = pickle.load(f)
+        logger.info(f"**************loaded compiled plan {digest[:12]} from cache in "
+                    f"{(time.perf_counter() - start) * 1000:.1f} ms**************\n")
+        return plan
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.info(f"**************discarding unreadable plan cache {path}: {e}**************\n")
+
+    plan = compile_plan(tasks, task_package, transition_package)
+    try:
+        # write to a temp file first so a crash never leaves a truncated cache entry
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(plan, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.info(f"**************could not cache compiled plan: {e}**************\n")
+    logger.info(f"**************compiled plan {digest[:12]} ({len(plan)} tasks) in "
+                f"{(time.perf_counter() - start) * 1000:.1f} ms**************\n")
+    return plan
@@ -0,0 +1,332 @@
+# SPDX-FileCopyrightText: 2023 Carnegie Mellon University - Satyalab
+#
+# SPDX-License-Identifier: GPL-2.0-only
+
+import asyncio
+import itertools
+import logging
+import time
+from aenum import Enum
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+class Resource(Enum):
+    FlightControl = 1
+    Gimbal = 2
+    Compute = 3
+
+
+class Lease():
+    """Exclusive hold on a set of resources, granted by a ResourceArbiter."""
+    __slots__ = ("owner", "resources", "priority", "preemptible", "on_preempt",
+                 "granted_at", "preempted", "released")
+
+    def __init__(self, owner, resources, priority, preemptible, on_preempt):
+        self.owner = owner
+        self.resources = resources
+        self.priority = priority
+        self.preemptible = preemptible
+        self.on_preempt = on_preempt
+        self.granted_at = None
+        self.preempted = False
+        self.released = False
+
+
+class ResourceArbiter():
+    """Grants leases on exclusive resources by priority, preempting lower-priority holders.
+
+    Requests are all-or-nothing so two tasks can never deadlock holding half of
+    each other's resources. Waiters are served highest priority first, FIFO within
+    a priority, and a blocked waiter reserves its resources against lower ones.
+    """
+
+    def __init__(self, resources=tuple(Resource)):
+        self.holders = {resource: None for resource in resources}
+        self.waiters = []
+        self.seq = itertools.count()
+        self.created_at = time.monotonic()
+        self.busy_time = {resource: 0.0 for resource in resources}
+        self.lease_count = {resource: 0 for resource in resources}
+        self.preemptions = 0
+        self.waits = []
+
+    async def acquire(self, owner, resources, priority=0, preemptible=True, on_preempt=None):
+        resources = frozenset(resources)
+        unknown = resources - self.holders.keys()
+        if unknown:
+            raise ValueError(f"unknown resources {sorted(r.name for r in unknown)}")
+
+        lease = Lease(owner, resources, priority, preemptible, on_preempt)
+        requested_at = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.append((-priority, next(self.seq), lease, future))
+        self.waiters.sort(key=lambda waiter: waiter[:2])
+        self._dispatch()
+        if not future.done():
+            self._preempt_for(lease)
+        try:
+            await future
+        except asyncio.CancelledError:
+            self.waiters = [waiter for waiter in self.waiters if waiter[2] is not lease]
+            if lease.granted_at is not None:
+                self.release(lease)
+            raise
+
+        wait = lease.granted_at - requested_at
+        self.waits.append(wait)
+        if wait > 0:
+            logger.info(f"**************task {owner}: waited {wait:.3f}s for {self._names(resources)}**************\n")
+        return lease
+
+    def release(self, lease):
+        if lease.released or lease.granted_at is None:
+            return
+        lease.released = True
+        held = time.monotonic() - lease.granted_at
+        for resource in lease.resources:
+            self.holders[resource] = None
+            self.busy_time[resource] += held
+        self._dispatch()
+
+    def _dispatch(self):
+        reserved = set()
+        for waiter in list(self.waiters):
+            _, _, lease, future = waiter
+            free = all(self.holders[r] is None for r in lease.resources)
+            if free and not (lease.resources & reserved):
+                self.waiters.remove(waiter)
+                lease.granted_at = time.monotonic()
+                for resource in lease.resources:
+                    self.holders[resource] = lease
+                    self.lease_count[resource] += 1
+                if not future.done():
+                    future.set_result(lease)
+            else:
+                reserved |= lease.resources
+
+    def _preempt_for(self, lease):
+        holders = {self.holders[r] for r in lease.resources} - {None}
+        # only preempt when it actually frees everything the request needs
+        if not holders or any(not h.preemptible or h.priority >= lease.priority for h in holders):
+            return
+        for holder in holders:
+            if holder.preempted:
+                continue
+            holder.preempted = True
+            self.preemptions += 1
+            logger.info(f"**************task {lease.owner} preempts task {holder.owner} "
+                        f"on {self._names(holder.resources & lease.resources)}**************\n")
+            if holder.on_preempt is not None:
+                holder.on_preempt()
+
+    def report(self):
+        now = time.monotonic()
+        elapsed = max(now - self.created_at, 1e-9)
+        resources = {}
+        for resource, holder in self.holders.items():
+            busy = self.busy_time[resource]
+            if holder is not None:
+                busy += now - holder.granted_at
+            resources[resource.name] = {
+                "utilization": busy / elapsed,
+                "leases": self.lease_count[resource],
+            }
+        waits = sorted(self.waits)
+        return {
+            "elapsed": elapsed,
+            "resources": resources,
+            "preemptions": self.preemptions,
+            "lease_wait": {
+                "count": len(waits),
+                "mean": sum(waits) / len(waits) if waits else 0.0,
+                "p95": waits[min(len(waits) - 1, int(0.95 * len(waits)))] if waits else 0.0,
+                "max": waits[-1] if waits else 0.0,
+            },
+        }
+
+    @staticmethod
+    def _names(resources):
+        return ", ".join(sorted(r.name for r in resources))
+
+
+class ScheduledTask():
+    __slots__ = ("task", "after", "resources", "priority", "preemptible",
+                 "done", "run", "triggered", "event", "outcome", "lease_wait", "preemptions")
+
+    def __init__(self, task, after, resources, priority, preemptible):
+        self.task = task
+        self.after = tuple(after)
+        self.resources = frozenset(resources)
+        self.priority = priority
+        self.preemptible = preemptible
+        self.done = asyncio.Event()
+        self.run = None
+        self.triggered = asyncio.Event()
+        self.event = None
+        self.outcome = None
+        self.lease_wait = 0.0
+        self.preemptions = 0
+
+    def preempt(self):
+        # handed to the arbiter before the lease can be granted, so there is no window
+        # in which the lease is marked preempted without anyone stopping the task
+        if self.run is not None and not self.run.done():
+            self.run.cancel()
+
+
+class TaskScheduler():
+    """Runs a graph of tasks concurrently, arbitrating their resources through leases.
+
+    A task starts once every task in its `after` list has finished and it holds a
+    lease on all of its resources. It finishes when `run()` returns or, as in the
+    single-task runtime, when one of its transitions posts an event. A preempted
+    task is cancelled, gives its lease back and is restarted from the beginning
+    when the lease becomes free again. A task cancelled while holding flight
+    control is made to hover before the lease is handed on, including when the
+    scheduler itself is cancelled. Tasks that depend on a failed task are
+    skipped, and a task that raises cancels the rest of the graph.
+    """
+
+    def __init__(self, arbiter=None, poll_interval=0.05):
+        self.arbiter = arbiter if arbiter is not None else ResourceArbiter()
+        self.poll_interval = poll_interval
+        self.nodes = {}
+
+    def add(self, task, after=(), resources=None, priority=0, preemptible=True):
+        task_id = task.get_task_id()
+        if task_id in self.nodes:
+            raise ValueError(f"task {task_id} is already scheduled")
+        if resources is None:
+            resources = task.required_resources()
+        self.nodes[task_id] = ScheduledTask(task, after, resources, priority, preemptible)
+        return task_id
+
+    def _check_graph(self):
+        for task_id, node in self.nodes.items():
+            missing = [dep for dep in node.after if dep not in self.nodes]
+            if missing:
+                raise ValueError(f"task {task_id} depends on unscheduled tasks {missing}")
+            if task_id in node.after:
+                raise ValueError(f"task {task_id} depends on itself")
+        # Kahn's algorithm: whatever cannot be ordered sits on a cycle and would wait forever
+        pending = {task_id: len(set(node.after)) for task_id, node in self.nodes.items()}
+        ready = [task_id for task_id, count in pending.items() if count == 0]
+        while ready:
+            done = ready.pop()
+            del pending[done]
+            for task_id, node in self.nodes.items():
+                if done in node.after:
+                    pending[task_id] -= 1
+                    if pending[task_id] == 0:
+                        ready.append(task_id)
+        if pending:
+            raise ValueError(f"dependency cycle between tasks {sorted(pending, key=str)}")
+
+    async def run(self):
+        self._check_graph()
+        events = asyncio.ensure_future(self._pump_events())
+        runs = [asyncio.ensure_future(self._run_node(node)) for node in self.nodes.values()]
+        try:
+            await asyncio.gather(*runs)
+        except BaseException:
+            # one node failed or the scheduler was cancelled: stop (and hover) the rest
+            for run in runs:
+                run.cancel()
+            await asyncio.gather(*runs, return_exceptions=True)
+            raise
+        finally:
+            events.cancel()
+        report = self.report()
+        logger.info(f"**************scheduler finished: {report}**************\n")
+        return report
+
+    async def _pump_events(self):
+        """Route (task_id, event) pairs posted by transition threads to their tasks."""
+        queues = list({id(node.task.trigger_event_queue): node.task.trigger_event_queue
+                       for node in self.nodes.values()}.values())
+        while True:
+            for trigger_event_queue in queues:
+                while not trigger_event_queue.empty():
+                    task_id, event = trigger_event_queue.get_nowait()
+                    node = self.nodes.get(task_id)
+                    # "done" comes from Task._exit after run() returned, which is handled directly
+                    if node is None or event == "done" or node.run is None:
+                        continue
+                    logger.info(f"**************task {task_id}: transition event {event}**************\n")
+                    node.event = event
+                    node.triggered.set()
+            await asyncio.sleep(self.poll_interval)
+
+    async def _run_node(self, node):
+        task_id = node.task.get_task_id()
+        try:
+            for dep in node.after:
+                await self.nodes[dep].done.wait()
+            failed = [dep for dep in node.after if self.nodes[dep].outcome in ("failed", "skipped")]
+            if failed:
+                logger.info(f"**************task {task_id}: skipped, dependencies {failed} failed**************\n")
+                node.outcome = "skipped"
+                return
+            while True:
+                node.run = None
+                node.event = None
+                node.triggered.clear()
+                requested_at = time.monotonic()
+                lease = await self.arbiter.acquire(task_id, node.resources, node.priority,
+                                                   node.preemptible, on_preempt=node.preempt)
+                node.lease_wait += lease.granted_at - requested_at
+                if lease.preempted:
+                    # preempted between the grant and this task resuming
+                    self.arbiter.release(lease)
+                    node.preemptions += 1
+                    continue
+
+                node.run = asyncio.ensure_future(node.task.run())
+                triggered = asyncio.ensure_future(node.triggered.wait())
+                try:
+                    await asyncio.wait([node.run, triggered], return_when=asyncio.FIRST_COMPLETED)
+                    if not node.run.done():
+                        # a transition fired: the task is over, stop it like the runtime does
+                        node.run.cancel()
+                        await asyncio.wait([node.run])
+                finally:
+                    triggered.cancel()
+                    if not node.run.done():
+                        # the scheduler itself was cancelled: let the task unwind first
+                        node.run.cancel()
+                        await asyncio.wait([node.run])
+                    if node.run.cancelled() and Resource.FlightControl in lease.resources:
+                        await self._hover(node.task)
+                    self.arbiter.release(lease)
+
+                if node.event is not None:
+                    node.outcome = node.event
+                elif node.run.cancelled() and lease.preempted:
+                    node.preemptions += 1
+                    logger.info(f"**************task {task_id}: preempted, waiting to restart**************\n")
+                    continue
+                elif not node.run.cancelled() and node.run.exception() is not None:
+                    logger.error(f"task {task_id} failed: {node.run.exception()}")
+                    node.outcome = "failed"
+                else:
+                    node.outcome = "done"
+                break
+        finally:
+            node.done.set()
+
+    async def _hover(self, task):
+        # the cancelled task's last velocity or PCMD command would otherwise keep running
+        try:
+            await task.control.hover()
+        except Exception as e:
+            logger.error(f"task {task.get_task_id()}: failed to hover after cancel: {e}")
+
+    def report(self):
+        report = self.arbiter.report()
+        report["tasks"] = {
+            task_id: {"lease_wait": node.lease_wait, "preemptions": node.preemptions,
+                      "outcome": node.outcome}
+            for task_id, node in self.nodes.items()
+        }
+        return report
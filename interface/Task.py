@@ -3,10 +3,13 @@
 # SPDX-License-Identifier: GPL-2.0-only
 
 from abc import ABC, abstractmethod
+import asyncio
 import functools
 import logging
 import threading
 from aenum import Enum
+from interface.MissionPlan import compile_transitions
+from interface.Scheduler import Resource
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -24,16 +27,32 @@ class TaskArguments():
         self.transitions_attributes = transitions_attributes
         
 class Task(ABC):
+    # typed record the raw task attributes are compiled into, see interface.MissionPlan;
+    # without one the task keeps its raw attribute dict
+    attributes_class = None
+    # resources leased exclusively while the task runs, see interface.Scheduler
+    resources = (Resource.FlightControl, Resource.Gimbal, Resource.Compute)
 
     def __init__(self, control, data, task_id, trigger_event_queue, task_args):
         self.data = data
         self.control = control
-        self.task_attributes = task_args.task_attributes
-        self.transitions_attributes = task_args.transitions_attributes
+        # no-op for plans compiled ahead of time, otherwise validate before the task runs
+        if self.attributes_class is None:
+            self.task_attributes = task_args.task_attributes
+        else:
+            self.task_attributes = self.attributes_class.from_raw(task_args.task_attributes)
+        self.transitions_attributes = compile_transitions(task_args.transitions_attributes)
+        self.validate(self.task_attributes, self.transitions_attributes)
         self.task_id = task_id
         self.trans_active =  []
         self.trans_active_lock = threading.Lock()
         self.trigger_event_queue = trigger_event_queue
+        self.transition_triggered = threading.Event()
+
+    @classmethod
+    def validate(cls, task_attributes, transitions_attributes):
+        """Cross-check compiled attributes and transitions; raise PlanCompileError if unusable."""
+        pass
 
     @abstractmethod
     async def run(self):
@@ -42,6 +61,9 @@ class Task(ABC):
     def get_task_id(self):
         return self.task_id
 
+    def required_resources(self):
+        return self.resources
+
 
     def _exit(self):
         # kill all the transitions
@@ -63,13 +85,21 @@ class Task(ABC):
         """Decorator to call _exit after the decorated function completes."""
         @functools.wraps(func)
         async def wrapper(self, *args, **kwargs):
+            cancelled = False
             try:
                 # Call the decorated function
                 result = await func(self, *args, **kwargs)
                 return result
+            except asyncio.CancelledError:
+                cancelled = True
+                raise
             finally:
-                # Ensure _exit is called after the function completes
-                self._exit()
+                if cancelled:
+                    # e.g. preempted by the scheduler, which restarts it later: not done yet
+                    self.stop_trans()
+                else:
+                    # Ensure _exit is called after the function completes
+                    self._exit()
 
         return wrapper
         
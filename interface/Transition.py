@@ -13,6 +13,8 @@ class Transition(threading.Thread, ABC):
         self.trans_active = args['trans_active']
         self.trans_active_lock = args['trans_active_lock']
         self.trigger_event_queue = args['trigger_event_queue']
+        # threading.Event of the owning task, set whenever any of its transitions fires
+        self.transition_triggered = args.get('transition_triggered')
         # self.trigger_event_queue_lock = trigger_event_queue_lock
         
     @abstractmethod
@@ -24,6 +26,8 @@ class Transition(threading.Thread, ABC):
         logger.info(f"**************task id {self.task_id}: triggered event! {event}**************\n")
         # with self.trigger_event_queue_lock:
         self.trigger_event_queue.put((self.task_id,  event))
+        if self.transition_triggered is not None:
+            self.transition_triggered.set()
     
     def _register(self):
         logger.info(f"**************{self.name} is registering by itself**************\n")
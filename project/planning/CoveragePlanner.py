@@ -0,0 +1,198 @@
+# SPDX-FileCopyrightText: 2023 Carnegie Mellon University - Satyalab
+#
+# SPDX-License-Identifier: GPL-2.0-only
+
+import logging
+import math
+import numpy as np
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+EARTH_RADIUS = 6371008.8
+
+# Camera field of view, same as TrackTask
+HFOV = 69
+VFOV = 43
+
+
+''' Helper Functions '''
+def to_local(lat, lng, origin):
+    """Project lat/lng (degrees) to metres east/north of `origin` (equirectangular)."""
+    lat0, lng0 = origin
+    x = np.radians(np.asarray(lng, dtype=float) - lng0) * math.cos(math.radians(lat0)) * EARTH_RADIUS
+    y = np.radians(np.asarray(lat, dtype=float) - lat0) * EARTH_RADIUS
+    return np.stack([x, y], axis=-1)
+
+
+def to_global(points, origin):
+    lat0, lng0 = origin
+    lat = lat0 + np.degrees(points[:, 1] / EARTH_RADIUS)
+    lng = lng0 + np.degrees(points[:, 0] / (EARTH_RADIUS * math.cos(math.radians(lat0))))
+    return lat, lng
+
+
+def route_length(points):
+    """Length in metres of the open path through `points` (local coordinates)."""
+    return float(np.linalg.norm(np.diff(points, axis=0), axis=1).sum())
+
+
+def camera_footprint(altitude, gimbal_pitch, hfov=HFOV, vfov=VFOV):
+    """Ground footprint (width, depth) in metres of the camera at `altitude`.
+
+    `gimbal_pitch` follows DetectTask: degrees from the horizon, -90 looks straight
+    down. The width is taken at the near edge of the frame, so lanes spaced by it
+    leave no gaps.
+    """
+    off_nadir = 90.0 - abs(gimbal_pitch)
+    near = math.radians(off_nadir - vfov / 2)
+    far = math.radians(off_nadir + vfov / 2)
+    if far >= math.pi / 2:
+        raise ValueError(f"gimbal pitch {gimbal_pitch} puts the horizon in frame, no bounded footprint")
+    # distance to the near edge along the optical axis, times the horizontal half-FOV
+    width = 2 * altitude * math.cos(math.radians(vfov / 2)) / math.cos(near) * math.tan(math.radians(hfov / 2))
+    depth = altitude * (math.tan(far) - math.tan(near))
+    return width, depth
+
+
+''' Coverage '''
+def boustrophedon(polygon, altitude, gimbal_pitch, overlap=0.2, hfov=HFOV, vfov=VFOV):
+    """Back-and-forth coverage route over `polygon`, a list of {"lat", "lng"} vertices.
+
+    Lanes run parallel to the longest polygon edge, which keeps the number of
+    turns low, and are spaced one camera footprint width apart less `overlap`.
+    Returns a coords list that DetectTask consumes directly. Raises ValueError
+    for a degenerate polygon that no lane crosses, since DetectTask would read
+    an empty list as "scan in place".
+    """
+    if len(polygon) < 3:
+        raise ValueError("a search polygon needs at least 3 vertices")
+    if not 0 <= overlap < 1:
+        raise ValueError(f"overlap must be in [0, 1), got {overlap}")
+    width, _ = camera_footprint(altitude, gimbal_pitch, hfov, vfov)
+    spacing = width * (1 - overlap)
+
+    lat = np.array([p["lat"] for p in polygon], dtype=float)
+    lng = np.array([p["lng"] for p in polygon], dtype=float)
+    origin = (lat.mean(), lng.mean())
+    vertices = to_local(lat, lng, origin)
+    area = 0.5 * abs(np.dot(vertices[:, 0], np.roll(vertices[:, 1], -1))
+                     - np.dot(vertices[:, 1], np.roll(vertices[:, 0], -1)))
+    if area < 1.0:
+        raise ValueError(f"search polygon is degenerate ({area:.2g} m^2)")
+
+    # rotate so the longest edge lies along x and lanes become horizontal lines
+    edges = np.roll(vertices, -1, axis=0) - vertices
+    longest = edges[np.argmax(np.hypot(edges[:, 0], edges[:, 1]))]
+    angle = math.atan2(longest[1], longest[0])
+    rot = np.array([[math.cos(angle), math.sin(angle)], [-math.sin(angle), math.cos(angle)]])
+    local = vertices @ rot.T
+
+    # enough lanes to reach both edges, spread evenly so none is further apart than `spacing`
+    lo, hi = local[:, 1].min(), local[:, 1].max()
+    n_lanes = max(1, math.ceil((hi - lo) / spacing))
+    lanes = lo + (np.arange(n_lanes) + 0.5) * (hi - lo) / n_lanes
+
+    # intersect every lane with every edge at once
+    a = local
+    b = np.roll(local, -1, axis=0)
+    y = lanes[:, None]
+    dy = b[:, 1] - a[:, 1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = (y - a[:, 1]) / dy
+    # half-open test so a lane through a vertex counts it once
+    crosses = (dy != 0) & (((a[:, 1] <= y) & (y < b[:, 1])) | ((b[:, 1] <= y) & (y < a[:, 1])))
+    xs = np.where(crosses, a[:, 0] + t * (b[:, 0] - a[:, 0]), np.nan)
+
+    route = []
+    for k, lane in enumerate(lanes):
+        hits = np.sort(xs[k][~np.isnan(xs[k])])
+        # consecutive pairs are the inside segments; several per lane for non-convex areas
+        segments = hits[: len(hits) // 2 * 2].reshape(-1, 2)
+        if k % 2:
+            segments = segments[::-1, ::-1]
+        for x0, x1 in segments:
+            route.append((x0, lane))
+            route.append((x1, lane))
+
+    if not route:
+        raise ValueError("search polygon is degenerate, no coverage lane crosses it")
+    points = np.array(route, dtype=float).reshape(-1, 2) @ rot
+    logger.info(f"**************coverage: {len(lanes)} lanes, {(hi - lo) / n_lanes:.1f} m apart, "
+                f"{route_length(points):.0f} m route**************\n")
+    return _to_coords(points, origin, altitude)
+
+
+''' Waypoint ordering '''
+def order_waypoints(coords, start=None, max_passes=50):
+    """Reorder `coords` into a short open route: nearest neighbour, then 2-opt.
+
+    The route begins at `start` (an index into `coords`, default the first
+    waypoint) and may end anywhere. Returns a new coords list.
+    """
+    if start is None:
+        start = 0
+    elif not 0 <= start < len(coords):
+        raise ValueError(f"start index {start} out of range for {len(coords)} waypoints")
+    if len(coords) < 3:
+        return [coords[i] for i in range(len(coords)) if i == start] + \
+               [coords[i] for i in range(len(coords)) if i != start]
+    lat = np.array([c["lat"] for c in coords], dtype=float)
+    lng = np.array([c["lng"] for c in coords], dtype=float)
+    points = to_local(lat, lng, (lat.mean(), lng.mean()))
+
+    order = nearest_neighbour(points, start)
+    order = two_opt(points, order, max_passes)
+    logger.info(f"**************ordered {len(coords)} waypoints: {route_length(points):.0f} m -> "
+                f"{route_length(points[order]):.0f} m**************\n")
+    return [coords[i] for i in order]
+
+
+def nearest_neighbour(points, start=0):
+    n = len(points)
+    order = np.empty(n, dtype=np.intp)
+    visited = np.zeros(n, dtype=bool)
+    current = start
+    for k in range(n):
+        order[k] = current
+        visited[current] = True
+        if k == n - 1:
+            break
+        dist = np.einsum("ij,ij->i", points - points[current], points - points[current])
+        dist[visited] = np.inf
+        current = int(np.argmin(dist))
+    return order
+
+
+def two_opt(points, order, max_passes=50):
+    """Improve an open path by reversing segments, keeping its first point fixed."""
+    order = np.array(order, dtype=np.intp)
+    n = len(order)
+    def edges(path):
+        # length of edge (k, k+1); the open end costs nothing
+        return np.append(np.linalg.norm(path[1:] - path[:-1], axis=1), 0.0)
+
+    path = points[order]
+    edge = edges(path)
+    for _ in range(max_passes):
+        improved = False
+        for i in range(n - 2):
+            j = np.arange(i + 2, n)
+            new_first = np.linalg.norm(path[j] - path[i], axis=1)
+            nxt = np.minimum(j + 1, n - 1)
+            new_second = np.where(j < n - 1, np.linalg.norm(path[nxt] - path[i + 1], axis=1), 0.0)
+            gain = edge[i] + edge[j] - new_first - new_second
+            best = int(np.argmax(gain))
+            if gain[best] > 1e-9:
+                order[i + 1:j[best] + 1] = order[i + 1:j[best] + 1][::-1]
+                path = points[order]
+                edge = edges(path)
+                improved = True
+        if not improved:
+            break
+    return order
+
+
+def _to_coords(points, origin, altitude):
+    lat, lng = to_global(points, origin)
+    return [{"lat": float(la), "lng": float(ln), "alt": altitude} for la, ln in zip(lat, lng)]
@@ -11,12 +11,14 @@ import logging
 from gabriel_protocol import gabriel_pb2
 from ..transition_defs.TimerTransition import TimerTransition
 from interface.Task import Task
+from interface.Scheduler import Resource
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 class AvoidTask(Task):
-        
+    # only consumes obstacle-avoidance results, it never reconfigures compute
+    resources = (Resource.FlightControl, Resource.Gimbal)
 
     def __init__(self, drone, cloudlet, task_id, trigger_event_queue, task_args):
         super().__init__(drone, cloudlet, task_id, trigger_event_queue, task_args)
@@ -39,7 +41,8 @@ class AvoidTask(Task):
             'task_id': self.task_id,
             'trans_active': self.trans_active,
             'trans_active_lock': self.trans_active_lock,
-            'trigger_event_queue': self.trigger_event_queue
+            'trigger_event_queue': self.trigger_event_queue,
+            'transition_triggered': self.transition_triggered
         }
         
         # Triggered event
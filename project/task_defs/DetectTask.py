@@ -3,8 +3,9 @@ from ..transition_defs.ObjectDetectionTransition import ObjectDetectionTransitio
 from ..transition_defs.TimerTransition import TimerTransition
 from ..transition_defs.HSVDetectionTransition import HSVDetectionTransition
 from interface.Task import Task
+from interface.MissionPlan import Field, PlanCompileError, TaskAttributes, TRANSITIONS, as_is, to_float, to_str, to_waypoints
+from interface.Scheduler import Resource
 import asyncio
-import ast
 import logging
 from gabriel_protocol import gabriel_pb2
 
@@ -12,10 +13,36 @@ from gabriel_protocol import gabriel_pb2
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+class DetectAttributes(TaskAttributes):
+    __slots__ = ("model", "lower_bound", "upper_bound", "coords", "gimbal_pitch")
+    fields = (
+        Field("model", to_str),
+        Field("lower_bound", as_is),
+        Field("upper_bound", as_is),
+        Field("coords", to_waypoints),
+        # optional: a background scan can leave the gimbal to a concurrent motion task
+        Field("gimbal_pitch", to_float, required=False),
+    )
+
 class DetectTask(Task):
+    attributes_class = DetectAttributes
 
     def __init__(self, control, data, task_id, trigger_event_queue, task_args):
         super().__init__(control, data, task_id, trigger_event_queue, task_args)
+
+    @classmethod
+    def validate(cls, task_attributes, transitions_attributes):
+        if not task_attributes.coords and not any(name in TRANSITIONS for name in transitions_attributes):
+            raise PlanCompileError("DetectTask: scanning in place (no coords) needs a transition to end it")
+
+    def required_resources(self):
+        # without waypoints the task only scans in place, so a motion task can fly meanwhile
+        resources = [Resource.Compute]
+        if self.task_attributes.coords:
+            resources.append(Resource.FlightControl)
+        if self.task_attributes.gimbal_pitch is not None:
+            resources.append(Resource.Gimbal)
+        return tuple(resources)
        
         
     def create_transition(self):
@@ -26,7 +53,8 @@ class DetectTask(Task):
             'task_id': self.task_id,
             'trans_active': self.trans_active,
             'trans_active_lock': self.trans_active_lock,
-            'trigger_event_queue': self.trigger_event_queue
+            'trigger_event_queue': self.trigger_event_queue,
+            'transition_triggered': self.transition_triggered
         }
         
         # triggered event
@@ -54,24 +82,32 @@ class DetectTask(Task):
     async def run(self):
         # init the data
         logger.info("test, for pullin3")
-        model = self.task_attributes["model"]
-        lower_bound = self.task_attributes["lower_bound"]
-        upper_bound = self.task_attributes["upper_bound"]
+        model = self.task_attributes.model
+        lower_bound = self.task_attributes.lower_bound
+        upper_bound = self.task_attributes.upper_bound
         self.control.configure_compute(model, lower_bound, upper_bound)
+        self.transition_triggered.clear()
         self.create_transition()
         # try:
         logger.info(f"**************Detect Task {self.task_id}: hi this is detect task {self.task_id}**************\n")
-        coords = ast.literal_eval(self.task_attributes["coords"])
-        await self.control.setGimbalPose(0.0, float(self.task_attributes["gimbal_pitch"]), 0.0)
+        coords = self.task_attributes.coords
+        if self.task_attributes.gimbal_pitch is not None:
+            await self.control.setGimbalPose(0.0, self.task_attributes.gimbal_pitch, 0.0)
         for dest in coords:
-            lng = dest["lng"]
-            lat = dest["lat"]
-            alt = dest["alt"]
+            lng = dest.lng
+            lat = dest.lat
+            alt = dest.alt
             logger.info(f"**************Detect Task {self.task_id}: Move **************\n")
             logger.info(f"**************Detect Task {self.task_id}: move to {lat}, {lng}, {alt}**************\n")
             await self.control.moveTo(lat, lng, alt)
             await asyncio.sleep(1)
 
+        if not coords:
+            # scan in place until one of the transitions fires
+            logger.info(f"**************Detect Task {self.task_id}: scanning in place**************\n")
+            while not self.transition_triggered.is_set():
+                await asyncio.sleep(0.1)
+
         logger.info(f"**************Detect Task {self.task_id}: Done**************\n")
 
 
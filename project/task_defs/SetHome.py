@@ -3,21 +3,29 @@
 # SPDX-License-Identifier: GPL-2.0-only
 
 from interface.Task import Task
-import ast
+from interface.MissionPlan import Field, TaskAttributes, to_ground_waypoints
+from interface.Scheduler import Resource
+
+class SetHomeAttributes(TaskAttributes):
+    __slots__ = ("coords",)
+    fields = (
+        Field("coords", to_ground_waypoints),
+    )
 
 class SetHome(Task):
+    attributes_class = SetHomeAttributes
+    resources = (Resource.FlightControl,)
 
-    def __init__(self, drone, cloudlet, **kwargs):
-        super().__init__(drone, cloudlet, **kwargs)
+    def __init__(self, drone, cloudlet, task_id, trigger_event_queue, task_args):
+        super().__init__(drone, cloudlet, task_id, trigger_event_queue, task_args)
+        self.drone = drone
 
     @Task.call_after_exit
     async def run(self):
         try:
-            coords = ast.literal_eval(self.kwargs["coords"])
-            lat = coords[0]["lat"]
-            lng = coords[0]["lng"]
+            coords = self.task_attributes.coords
+            lat = coords[0].lat
+            lng = coords[0].lng
             await self.drone.setHome(lat, lng, 1.0)
         except Exception as e:
             print(e)
-
-
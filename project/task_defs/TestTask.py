@@ -1,15 +1,24 @@
 
 from ..transition_defs.TimerTransition import TimerTransition
 from interface.Task import Task
+from interface.MissionPlan import Field, TaskAttributes, to_waypoints
+from interface.Scheduler import Resource
 import asyncio
-import ast
 import logging
 
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+class TestAttributes(TaskAttributes):
+    __slots__ = ("coords",)
+    fields = (
+        Field("coords", to_waypoints),
+    )
+
 class TestTask(Task):
+    attributes_class = TestAttributes
+    resources = (Resource.FlightControl,)
 
     def __init__(self, drone, cloudlet, task_id, trigger_event_queue, task_args):
         super().__init__(drone, cloudlet, task_id, trigger_event_queue, task_args)
@@ -23,7 +32,8 @@ class TestTask(Task):
             'task_id': self.task_id,
             'trans_active': self.trans_active,
             'trans_active_lock': self.trans_active_lock,
-            'trigger_event_queue': self.trigger_event_queue
+            'trigger_event_queue': self.trigger_event_queue,
+            'transition_triggered': self.transition_triggered
         }
         
         # triggered event
@@ -55,13 +65,13 @@ class TestTask(Task):
             logger.info(f"**************Test Task {self.task_id}: Detection Result: {detect_res}**************\n")
 
         # test for dronestub
-        coords = ast.literal_eval(self.task_attributes["coords"])
+        coords = self.task_attributes.coords
 
         logger.info(f"**************Test Task {self.task_id}: hi this is Test task2 {self.task_id}**************\n")
         for dest in coords:
-            lng = dest["lng"]
-            lat = dest["lat"]
-            alt = dest["alt"]
+            lng = dest.lng
+            lat = dest.lat
+            alt = dest.alt
             bear = 0
             logger.info(f"**************Test Task {self.task_id}: setGPSLocation **************\n")
             logger.info(f"**************Test Task {self.task_id}: GPSLocation: {lat}, {lng}, {alt} {bear}**************\n")
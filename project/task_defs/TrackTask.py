@@ -7,13 +7,39 @@ import math
 import time
 from ..transition_defs.TimerTransition import TimerTransition
 from interface.Task import Task
+from interface.AdaptiveCompute import AdaptiveComputeController
+from interface.MissionPlan import Field, TaskAttributes, as_is, to_float, to_str
+from interface.Scheduler import Resource
 import logging
 from scipy.spatial.transform import Rotation as R
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+class TrackAttributes(TaskAttributes):
+    __slots__ = ("model", "lower_bound", "upper_bound", "target_class", "altitude",
+                 "descent_speed", "orbit_speed", "follow_speed", "yaw_speed", "gimbal_offset",
+                 "min_rate", "max_rate", "target_latency")
+    fields = (
+        Field("model", to_str),
+        Field("lower_bound", as_is),
+        Field("upper_bound", as_is),
+        Field("target_class", to_str, key="class"),
+        Field("altitude", to_float),
+        Field("descent_speed", to_float),
+        Field("orbit_speed", to_float),
+        Field("follow_speed", to_float),
+        Field("yaw_speed", to_float),
+        Field("gimbal_offset", to_float),
+        # bounds for the adaptive compute rate, see interface.AdaptiveCompute
+        Field("min_rate", to_float, required=False, default=1.0),
+        Field("max_rate", to_float, required=False, default=20.0),
+        Field("target_latency", to_float, required=False, default=0.5),
+    )
+
 class TrackTask(Task):
+    attributes_class = TrackAttributes
+    resources = (Resource.FlightControl, Resource.Compute)
 
     def __init__(self, control, data, task_id, trigger_event_queue, task_args):
         super().__init__(control, data, task_id, trigger_event_queue, task_args)
@@ -22,6 +48,8 @@ class TrackTask(Task):
         self.HFOV = 69
         self.VFOV = 43
         self.target_lost_duration = 10
+        # a missed frame or two while following is not yet a lost target
+        self.target_grace = 1.0
         self.leash_length = 15.0
 
     def create_transition(self):
@@ -29,7 +57,8 @@ class TrackTask(Task):
             'task_id': self.task_id,
             'trans_active': self.trans_active,
             'trans_active_lock': self.trans_active_lock,
-            'trigger_event_queue': self.trigger_event_queue
+            'trigger_event_queue': self.trigger_event_queue,
+            'transition_triggered': self.transition_triggered
         }
 
         if ("timeout" in self.transitions_attributes):
@@ -108,78 +137,95 @@ class TrackTask(Task):
     @Task.call_after_exit
     async def run(self):
         # get the compute attributes
-        model = self.task_attributes["model"]
-        lower_bound = self.task_attributes["lower_bound"]
-        upper_bound = self.task_attributes["upper_bound"]
+        model = self.task_attributes.model
+        lower_bound = self.task_attributes.lower_bound
+        upper_bound = self.task_attributes.upper_bound
         await self.control.configure_compute(model, lower_bound, upper_bound)
+        self.compute = AdaptiveComputeController(self.control, self.task_attributes.min_rate,
+                                                 self.task_attributes.max_rate, self.task_attributes.target_latency)
+        await self.compute.start()
 
         # get the task attributes
-        target = self.task_attributes["class"]
-        altitude = self.task_attributes["altitude"]
-        descent_speed = self.task_attributes["descent_speed"]
-        orbit_speed = self.task_attributes["orbit_speed"]
-        follow_speed = self.task_attributes["follow_speed"]
-        yaw_speed = self.task_attributes["yaw_speed"]
-        gimbal_offset = self.task_attributes["gimbal_offset"]
+        target = self.task_attributes.target_class
+        altitude = self.task_attributes.altitude
+        descent_speed = self.task_attributes.descent_speed
+        orbit_speed = self.task_attributes.orbit_speed
+        follow_speed = self.task_attributes.follow_speed
+        yaw_speed = self.task_attributes.yaw_speed
+        gimbal_offset = self.task_attributes.gimbal_offset
 
         self.create_transition()
         last_seen = None
         descended = False
-        while True:
-            logger.info("Awaiting compute result")
-            response = await self.data.get_compute_result("openscout-object")
-            result = response.cpt.result
-            if len(result) == 0:
-                continue
-
-            detections = result[0].generic_result
-            logger.info(f"{detections=}")
-            try:
-                detections = json.loads(detections)
-            except Exception as e:
-                logger.error(e)
-                raise
-            if last_seen is not None and \
-                    int(time.time() - last_seen)  > self.target_lost_duration:
-                # If we have not found the target in N seconds trigger the done transition
-                logger.info(f"Breaking; {self.target_lost_duration=} {last_seen=} {time.time()=}")
-                break
-            telemetry = await self.data.get_telemetry()
-            global_pos = telemetry["global_position"]
-            if global_pos["relative_altitude"] <= altitude:
-                descended = True
-
-            box = None
-            # Return the first instance found of the target class
-            for det in detections:
-                #if det["class"] == 'bench':# and det["hsv_filter"]:
-                #    box = det["box"]
-                #    last_seen = time.time()
-                #    break
-                logger.info(f"Now following {det['class']}")
-                box = det["box"]
-                last_seen = time.time()
-                break
-
-            # Found an instance of target, start tracking!
-            if box is not None:
-                try:
-                    follow_error, yaw_error, gimbal_error = await self.error(box)
-                except Exception as e:
-                    logger.error(f"Failed to calculate error, reason: {e}")
+        try:
+            while True:
+                logger.info("Awaiting compute result")
+                requested_at = time.monotonic()
+                response = await self.data.get_compute_result("openscout-object")
+                await self.compute.observe(time.monotonic() - requested_at)
+                result = response.cpt.result
+                if len(result) == 0:
+                    continue
+
+                detections = result[0].generic_result
+                logger.info(f"{detections=}")
                 try:
-                    follow_vel = self.clamp(follow_error, -1 * follow_speed, follow_speed)
-                    yaw_vel = self.clamp(yaw_error, -1 * yaw_speed, yaw_speed)
+                    detections = json.loads(detections)
                 except Exception as e:
-                    logger.error(f"Failed to clamp, reason: {e}")
-                try:
-                    if descended:
-                        await self.actuate(0.0, yaw_vel, gimbal_offset, 0.0, descent_speed)
-                    else:
-                        await self.actuate(follow_vel, yaw_vel, gimbal_offset, orbit_speed, 0.0)
-                except Exception as e:
-                    logger.error(f"Failed to actuate, reason: {e}")
-                logger.info("Successfully actuated")
-
-            await asyncio.sleep(0.05)
+                    logger.error(e)
+                    raise
+                if last_seen is not None and \
+                        int(time.time() - last_seen)  > self.target_lost_duration:
+                    # If we have not found the target in N seconds trigger the done transition
+                    logger.info(f"Breaking; {self.target_lost_duration=} {last_seen=} {time.time()=}")
+                    break
+                telemetry = await self.data.get_telemetry()
+                global_pos = telemetry["global_position"]
+                if global_pos["relative_altitude"] <= altitude:
+                    descended = True
+
+                box = None
+                # Return the first instance found of the target class
+                for det in detections:
+                    #if det["class"] == 'bench':# and det["hsv_filter"]:
+                    #    box = det["box"]
+                    #    last_seen = time.time()
+                    #    break
+                    logger.info(f"Now following {det['class']}")
+                    box = det["box"]
+                    last_seen = time.time()
+                    break
+
+                # Found an instance of target, start tracking!
+                if box is not None:
+                    try:
+                        follow_error, yaw_error, gimbal_error = await self.error(box)
+                    except Exception as e:
+                        logger.error(f"Failed to calculate error, reason: {e}")
+                    try:
+                        follow_vel = self.clamp(follow_error, -1 * follow_speed, follow_speed)
+                        yaw_vel = self.clamp(yaw_error, -1 * yaw_speed, yaw_speed)
+                    except Exception as e:
+                        logger.error(f"Failed to clamp, reason: {e}")
+                    try:
+                        if descended:
+                            await self.actuate(0.0, yaw_vel, gimbal_offset, 0.0, descent_speed)
+                        else:
+                            await self.actuate(follow_vel, yaw_vel, gimbal_offset, orbit_speed, 0.0)
+                    except Exception as e:
+                        logger.error(f"Failed to actuate, reason: {e}")
+                    logger.info("Successfully actuated")
+
+                # full rate while acquiring or following; once the target is lost, or
+                # while descending onto it, far fewer frames are needed
+                if descended:
+                    await self.compute.set_demand(0.2, "descending")
+                elif box is None and last_seen is not None and time.time() - last_seen > self.target_grace:
+                    await self.compute.set_demand(0.3, "target lost, hovering")
+                else:
+                    await self.compute.set_demand(1.0, "acquiring" if last_seen is None else "following")
+                await asyncio.sleep(self.compute.period)
+        finally:
+            # the normal end of tracking is a transition cancelling this task
+            logger.info(f"[TrackTask]: compute metrics {self.compute.metrics()}")
 
@@ -0,0 +1,83 @@
+import asyncio
+
+from interface.AdaptiveCompute import AdaptiveComputeController
+
+
+class RateDriver():
+    def __init__(self, accept=True):
+        self.accept = accept
+        self.rates = []
+
+    async def set_compute_rate(self, rate):
+        self.rates.append(rate)
+        return self.accept
+
+
+def test_demand_interpolates_between_bounds():
+    async def main():
+        driver = RateDriver()
+        compute = AdaptiveComputeController(driver, min_rate=2.0, max_rate=12.0)
+        await compute.start()
+        await compute.set_demand(0.5)
+        assert compute.rate == 7.0
+        await compute.set_demand(0.0)
+        assert compute.rate == 2.0
+        assert driver.rates == [12.0, 7.0, 2.0]
+
+    asyncio.run(main())
+
+
+def test_backs_off_on_latency_and_recovers():
+    async def main():
+        compute = AdaptiveComputeController(RateDriver(), min_rate=1.0, max_rate=20.0, target_latency=0.2)
+        await compute.start()
+        for _ in range(10):
+            await compute.observe(2.0)
+        slowed = compute.rate
+        assert 1.0 <= slowed < 10.0
+        for _ in range(40):
+            await compute.observe(0.01)
+        assert compute.rate > slowed
+        assert compute.rate == 20.0
+
+    asyncio.run(main())
+
+
+def test_no_savings_without_driver_rate_control():
+    async def main():
+        compute = AdaptiveComputeController(object())
+        await compute.start()
+        await compute.set_demand(0.0)
+        await asyncio.sleep(0.02)
+        metrics = compute.metrics()
+        assert not metrics["driver_rate_control"] and not metrics["rate_applied"]
+        assert metrics["frames_saved"] == 0.0 and metrics["mean_applied_rate"] is None
+
+    asyncio.run(main())
+
+
+def test_rejected_rate_is_not_counted():
+    async def main():
+        compute = AdaptiveComputeController(RateDriver(accept=False))
+        await compute.start()
+        await compute.set_demand(0.0)
+        await asyncio.sleep(0.02)
+        metrics = compute.metrics()
+        assert metrics["driver_rate_control"] and not metrics["rate_applied"]
+        assert metrics["frames_saved"] == 0.0
+
+    asyncio.run(main())
+
+
+def test_savings_counted_while_rate_applied():
+    async def main():
+        compute = AdaptiveComputeController(RateDriver(), min_rate=1.0, max_rate=20.0)
+        await compute.start()
+        await compute.set_demand(0.0)
+        await asyncio.sleep(0.05)
+        metrics = compute.metrics()
+        assert metrics["rate_applied"]
+        assert metrics["frames_saved"] > 0.0
+        assert metrics["mean_applied_rate"] < 20.0
+
+    asyncio.run(main())
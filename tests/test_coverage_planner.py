@@ -0,0 +1,81 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+from project.planning.CoveragePlanner import (boustrophedon, camera_footprint, nearest_neighbour,
+                                              order_waypoints, route_length, to_local, two_opt)
+
+
+def test_nadir_footprint_matches_pinhole_geometry():
+    width, depth = camera_footprint(30, -90, hfov=69, vfov=43)
+    near_edge = 30 / math.cos(math.radians(43 / 2))
+    assert width == pytest.approx(2 * near_edge * math.cos(math.radians(43 / 2)) * math.tan(math.radians(34.5)))
+    assert width == pytest.approx(41.24, abs=0.01)
+    assert depth == pytest.approx(2 * 30 * math.tan(math.radians(21.5)))
+
+
+def test_footprint_rejects_horizon_in_frame():
+    with pytest.raises(ValueError):
+        camera_footprint(30, -10)
+
+
+def test_boustrophedon_covers_square_with_lane_spacing():
+    d = 0.002
+    polygon = [{"lat": 0, "lng": 0}, {"lat": 0, "lng": d}, {"lat": d, "lng": d}, {"lat": d, "lng": 0}]
+    coords = boustrophedon(polygon, 30, -90, overlap=0.0)
+    side = d * math.pi / 180 * 6371008.8
+    width, _ = camera_footprint(30, -90)
+    assert len(coords) == 2 * math.ceil(side / width)
+    assert all(c["alt"] == 30 for c in coords)
+    assert all(-1e-9 <= c["lat"] <= d + 1e-9 and -1e-9 <= c["lng"] <= d + 1e-9 for c in coords)
+
+
+@pytest.mark.parametrize("polygon", [
+    [{"lat": 0, "lng": 0}, {"lat": 0, "lng": 0.001}, {"lat": 0, "lng": 0.002}],
+    [{"lat": 1, "lng": 1}] * 3,
+])
+def test_boustrophedon_rejects_degenerate_polygon(polygon):
+    with pytest.raises(ValueError):
+        boustrophedon(polygon, 30, -90)
+
+
+def test_two_opt_never_lengthens_and_keeps_start():
+    rng = np.random.default_rng(0)
+    points = rng.random((200, 2)) * 1000
+    order = nearest_neighbour(points, 0)
+    improved = two_opt(points, order.copy())
+    assert improved[0] == 0
+    assert sorted(improved) == list(range(200))
+    assert route_length(points[improved]) <= route_length(points[order]) + 1e-9
+
+
+def test_two_opt_untangles_crossing():
+    points = np.array([[0, 0], [1, 1], [1, 0], [2, 1]], dtype=float)
+    order = two_opt(points, [0, 1, 2, 3])
+    assert route_length(points[order]) < route_length(points)
+
+
+def test_order_waypoints_is_a_permutation():
+    random.seed(0)
+    coords = [{"lat": random.random() * 0.01, "lng": random.random() * 0.01, "alt": 20} for _ in range(100)]
+    ordered = order_waypoints(coords, start=5)
+    assert ordered[0] is coords[5]
+    assert sorted(map(id, ordered)) == sorted(map(id, coords))
+    points = lambda cs: to_local([c["lat"] for c in cs], [c["lng"] for c in cs], (0, 0))
+    assert route_length(points(ordered)) < route_length(points(coords))
+
+
+@pytest.mark.parametrize("start", [-1, 3, 10])
+def test_order_waypoints_rejects_start_out_of_range(start):
+    coords = [{"lat": 40.0 + i * 1e-4, "lng": -80.0, "alt": 20} for i in range(3)]
+    with pytest.raises(ValueError):
+        order_waypoints(coords, start=start)
+
+
+def test_order_waypoints_short_route_begins_at_start():
+    coords = [{"lat": 40.0, "lng": -80.0, "alt": 20}, {"lat": 40.001, "lng": -80.0, "alt": 20}]
+    assert order_waypoints(coords, start=1) == [coords[1], coords[0]]
+    with pytest.raises(ValueError):
+        order_waypoints(coords, start=2)
@@ -0,0 +1,131 @@
+import os
+import pickle
+import queue
+
+import pytest
+
+import interface.MissionPlan as MissionPlan
+from interface.MissionPlan import Field, PlanCompileError, Waypoint, compile_plan, load_plan, plan_digest, to_float
+from interface.Task import Task, TaskArguments
+from project.task_defs.DetectTask import DetectAttributes
+
+
+def detect(coords="[{'lat': 1, 'lng': 2, 'alt': 3}]", transitions=None, **overrides):
+    attributes = {"model": "coco", "lower_bound": "(0,0,0)", "upper_bound": "(255,255,255)",
+                  "coords": coords, "gimbal_pitch": "-45"}
+    attributes.update(overrides)
+    return TaskArguments("DetectTask", transitions or {}, attributes)
+
+
+def test_compiles_typed_records():
+    plan = compile_plan({"t1": detect(transitions={"timeout": "30"})})
+    compiled = plan["t1"]
+    assert compiled.task_attributes.coords == (Waypoint(1.0, 2.0, 3.0),)
+    assert compiled.task_attributes.gimbal_pitch == -45.0
+    assert compiled.task_attributes.lower_bound == "(0,0,0)"
+    assert compiled.transitions_attributes == {"timeout": 30.0}
+    assert compiled.transition_classes["timeout"].__name__ == "TimerTransition"
+
+
+@pytest.mark.parametrize("args, message", [
+    (detect(coords="[{'lat': 1, 'lng': 'x', 'alt': 3}]"), "task t1: DetectAttributes: invalid attribute 'coords'"),
+    (detect(coords="[{'lat': 1, 'lng': 2}]"), "task t1: DetectAttributes: invalid attribute 'coords'"),
+    (detect(gimbal_pitch="nan"), "task t1: DetectAttributes: invalid attribute 'gimbal_pitch'"),
+    (detect(model=None), "task t1: DetectAttributes: invalid attribute 'model'"),
+    (detect(transitions={"timeout": -1}), "task t1: invalid transition 'timeout'"),
+    (detect(transitions={"timeout": "inf"}), "task t1: invalid transition 'timeout'"),
+    (TaskArguments("NoSuchTask", {}, {}), "task t1: cannot resolve"),
+])
+def test_compile_errors_name_task_and_attribute(args, message):
+    with pytest.raises(PlanCompileError, match=message):
+        compile_plan({"t1": args})
+
+
+def test_missing_attribute_is_reported():
+    args = detect()
+    del args.task_attributes["model"]
+    with pytest.raises(PlanCompileError, match="missing attribute 'model'"):
+        compile_plan({"t1": args})
+
+
+def test_non_finite_numbers_rejected():
+    for value in ("nan", "inf", float("-inf")):
+        with pytest.raises(ValueError):
+            to_float(value)
+
+
+def test_set_home_may_omit_alt():
+    plan = compile_plan({"home": TaskArguments("SetHome", {}, {"coords": [{"lat": 1, "lng": 2}]})})
+    assert plan["home"].task_attributes.coords == (Waypoint(1.0, 2.0, None),)
+
+
+def test_tasks_without_schema_keep_raw_attributes():
+    plan = compile_plan({"a": TaskArguments("AvoidTask", {}, {"anything": "1"})})
+    assert plan["a"].task_attributes == {"anything": "1"}
+
+    class RawTask(Task):
+        async def run(self):
+            pass
+
+    task = RawTask(None, None, "r", queue.Queue(), TaskArguments("RawTask", {}, {"x": "1"}))
+    assert task.task_attributes["x"] == "1"
+
+
+def test_second_load_hits_cache(tmp_path, monkeypatch):
+    tasks = {"t1": detect()}
+    first = load_plan(tasks, str(tmp_path))
+    assert len(os.listdir(tmp_path)) == 1
+
+    def fail(*args, **kwargs):
+        raise AssertionError("plan was recompiled")
+
+    monkeypatch.setattr(MissionPlan, "compile_plan", fail)
+    second = load_plan(tasks, str(tmp_path))
+    assert second["t1"].task_attributes.coords == first["t1"].task_attributes.coords
+
+
+def test_field_change_invalidates_digest(monkeypatch):
+    tasks = {"t1": detect()}
+    before = plan_digest(tasks)
+    last = DetectAttributes.fields[-1]
+    monkeypatch.setattr(DetectAttributes, "fields",
+                        DetectAttributes.fields[:-1] + (Field(last.name, last.convert, required=not last.required),))
+    assert plan_digest(tasks) != before
+
+
+def test_stale_pickle_is_rejected_and_recompiled(tmp_path, monkeypatch):
+    tasks = {"t1": detect()}
+    stale = pickle.dumps(compile_plan(tasks))
+    # same record class, one field dropped: the old 5-value state no longer fits
+    monkeypatch.setattr(DetectAttributes, "fields", DetectAttributes.fields[:-1])
+    with pytest.raises(ValueError, match="stale DetectAttributes state"):
+        pickle.loads(stale)
+
+    # even if an old entry ends up under the current key, it is discarded and recompiled
+    os.chmod(tmp_path, 0o700)
+    (tmp_path / f"{plan_digest(tasks)}.pickle").write_bytes(stale)
+    recompiled = []
+    real_compile = MissionPlan.compile_plan
+    monkeypatch.setattr(MissionPlan, "compile_plan", lambda *a: recompiled.append(1) or real_compile(*a))
+    load_plan(tasks, str(tmp_path))
+    assert recompiled == [1]
+
+
+def test_unpickling_rejects_short_state():
+    record = DetectAttributes.__new__(DetectAttributes)
+    with pytest.raises(ValueError):
+        record.__setstate__((1, 2))
+    with pytest.raises(ValueError):
+        Waypoint.__new__(Waypoint).__setstate__((1, 2))
+
+
+def test_non_private_cache_dir_is_bypassed(tmp_path, monkeypatch):
+    os.chmod(tmp_path, 0o777)
+    compiled = []
+    real_compile = MissionPlan.compile_plan
+    monkeypatch.setattr(MissionPlan, "compile_plan", lambda *a: compiled.append(1) or real_compile(*a))
+    tasks = {"t1": detect()}
+    load_plan(tasks, str(tmp_path))
+    load_plan(tasks, str(tmp_path))
+    assert compiled == [1, 1]
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,271 @@
+import asyncio
+import queue
+
+import pytest
+
+from interface.Scheduler import Resource, ResourceArbiter, TaskScheduler
+from interface.Task import Task, TaskArguments
+from project.transition_defs.TimerTransition import TimerTransition
+
+FC = Resource.FlightControl
+GIMBAL = Resource.Gimbal
+COMPUTE = Resource.Compute
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_waiters_served_by_priority():
+    async def main():
+        arbiter = ResourceArbiter()
+        holder = await arbiter.acquire("holder", [FC], priority=10, preemptible=False)
+        granted = []
+
+        async def request(owner, priority):
+            lease = await arbiter.acquire(owner, [FC], priority=priority)
+            granted.append(owner)
+            arbiter.release(lease)
+
+        waiters = [asyncio.ensure_future(request("low", 0)), asyncio.ensure_future(request("high", 5))]
+        await settle()
+        assert granted == []
+        arbiter.release(holder)
+        await asyncio.gather(*waiters)
+        assert granted == ["high", "low"]
+
+    asyncio.run(main())
+
+
+def test_grants_are_all_or_nothing():
+    async def main():
+        arbiter = ResourceArbiter()
+        gimbal = await arbiter.acquire("a", [GIMBAL], preemptible=False)
+        both = asyncio.ensure_future(arbiter.acquire("b", [FC, GIMBAL], priority=1))
+        await settle()
+        # b must not sit on flight control while waiting for the gimbal
+        assert not both.done()
+        assert arbiter.holders[FC] is None
+        arbiter.release(gimbal)
+        lease = await both
+        assert arbiter.holders[FC] is lease and arbiter.holders[GIMBAL] is lease
+
+    asyncio.run(main())
+
+
+def test_blocked_waiter_reserves_against_lower_priority():
+    async def main():
+        arbiter = ResourceArbiter()
+        gimbal = await arbiter.acquire("a", [GIMBAL], preemptible=False)
+        high = asyncio.ensure_future(arbiter.acquire("high", [FC, GIMBAL], priority=5))
+        low = asyncio.ensure_future(arbiter.acquire("low", [FC], priority=0))
+        await settle()
+        assert not low.done()
+        arbiter.release(gimbal)
+        arbiter.release(await high)
+        await low
+
+    asyncio.run(main())
+
+
+def test_preempts_lower_priority_holder():
+    async def main():
+        arbiter = ResourceArbiter()
+        preempted = []
+        low = await arbiter.acquire("low", [FC, GIMBAL], priority=0, on_preempt=lambda: preempted.append("low"))
+        high = asyncio.ensure_future(arbiter.acquire("high", [FC], priority=5))
+        await settle()
+        assert preempted == ["low"] and low.preempted
+        assert not high.done()
+        arbiter.release(low)
+        assert (await high).owner == "high"
+        assert arbiter.report()["preemptions"] == 1
+
+    asyncio.run(main())
+
+
+def test_no_preemption_of_equal_or_non_preemptible_holders():
+    async def main():
+        arbiter = ResourceArbiter()
+        called = []
+        equal = await arbiter.acquire("equal", [FC], priority=5, on_preempt=lambda: called.append("equal"))
+        fixed = await arbiter.acquire("fixed", [GIMBAL], priority=0, preemptible=False,
+                                      on_preempt=lambda: called.append("fixed"))
+        waiters = [asyncio.ensure_future(arbiter.acquire("w1", [FC], priority=5)),
+                   asyncio.ensure_future(arbiter.acquire("w2", [GIMBAL], priority=9))]
+        await settle()
+        assert called == [] and not equal.preempted and not fixed.preempted
+        for w in waiters:
+            w.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+
+    asyncio.run(main())
+
+
+def test_cancel_while_waiting_removes_request():
+    async def main():
+        arbiter = ResourceArbiter()
+        holder = await arbiter.acquire("holder", [FC], preemptible=False)
+        cancelled = asyncio.ensure_future(arbiter.acquire("cancelled", [FC], priority=5))
+        waiting = asyncio.ensure_future(arbiter.acquire("waiting", [FC], priority=0))
+        await settle()
+        cancelled.cancel()
+        await asyncio.gather(cancelled, return_exceptions=True)
+        assert all(w[2].owner != "cancelled" for w in arbiter.waiters)
+        arbiter.release(holder)
+        assert (await waiting).owner == "waiting"
+
+    asyncio.run(main())
+
+
+def test_preempt_between_grant_and_resume_reaches_grantee():
+    async def main():
+        arbiter = ResourceArbiter()
+        holder = await arbiter.acquire("holder", [FC], priority=0, preemptible=False)
+        called = []
+        low = asyncio.ensure_future(arbiter.acquire("low", [FC], priority=0, on_preempt=lambda: called.append(1)))
+        await settle()
+        # grant low without letting it resume, then ask for the resource at a higher priority
+        arbiter.release(holder)
+        high = asyncio.ensure_future(arbiter.acquire("high", [FC], priority=9))
+        await settle()
+        lease = await low
+        assert lease.preempted and called == [1]
+        arbiter.release(lease)
+        assert (await high).owner == "high"
+
+    asyncio.run(main())
+
+
+class FakeControl():
+    def __init__(self):
+        self.hovers = 0
+
+    async def hover(self):
+        self.hovers += 1
+
+
+class LoopTask(Task):
+    resources = (FC,)
+
+    def __init__(self, task_id, duration=None, timeout=None, events=None):
+        transitions = {"timeout": timeout} if timeout is not None else {}
+        super().__init__(FakeControl(), None, task_id, events or queue.Queue(),
+                         TaskArguments("LoopTask", transitions, {}))
+        self.duration = duration
+        self.runs = 0
+
+    @Task.call_after_exit
+    async def run(self):
+        self.runs += 1
+        if "timeout" in self.transitions_attributes:
+            args = {
+                'task_id': self.task_id,
+                'trans_active': self.trans_active,
+                'trans_active_lock': self.trans_active_lock,
+                'trigger_event_queue': self.trigger_event_queue,
+                'transition_triggered': self.transition_triggered
+            }
+            timer = TimerTransition(args, self.transitions_attributes["timeout"])
+            timer.daemon = True
+            timer.start()
+        if self.duration is None:
+            while True:
+                await asyncio.sleep(0.01)
+        await asyncio.sleep(self.duration)
+
+
+def test_transition_event_finishes_task_and_hovers():
+    async def main():
+        scheduler = TaskScheduler(poll_interval=0.01)
+        task = LoopTask("a", timeout=0.1)
+        scheduler.add(task)
+        report = await asyncio.wait_for(scheduler.run(), 3)
+        assert report["tasks"]["a"]["outcome"] == "timeout"
+        assert task.control.hovers == 1
+
+    asyncio.run(main())
+
+
+def test_preempted_task_hovers_and_restarts():
+    async def main():
+        events = queue.Queue()
+        scheduler = TaskScheduler(poll_interval=0.01)
+        low = LoopTask("low", duration=0.2, events=events)
+        gate = LoopTask("gate", duration=0.05, events=events)
+        high = LoopTask("high", duration=0.05, events=events)
+        scheduler.add(low)
+        scheduler.add(gate, resources=())
+        scheduler.add(high, after=["gate"], priority=5)
+        report = await asyncio.wait_for(scheduler.run(), 3)
+        assert report["tasks"]["low"] == {"lease_wait": report["tasks"]["low"]["lease_wait"],
+                                          "preemptions": 1, "outcome": "done"}
+        assert low.runs == 2 and low.control.hovers == 1
+        assert report["tasks"]["high"]["outcome"] == "done"
+
+    asyncio.run(main())
+
+
+class FailingTask(LoopTask):
+    @Task.call_after_exit
+    async def run(self):
+        self.runs += 1
+        raise RuntimeError("boom")
+
+
+def test_rejects_cycles_and_self_dependencies():
+    scheduler = TaskScheduler()
+    scheduler.add(LoopTask("a"), after=["b"])
+    scheduler.add(LoopTask("b"), after=["a"])
+    scheduler.add(LoopTask("c"))
+    with pytest.raises(ValueError, match=r"cycle between tasks \['a', 'b'\]"):
+        asyncio.run(scheduler.run())
+
+    scheduler = TaskScheduler()
+    scheduler.add(LoopTask("a"), after=["a"])
+    with pytest.raises(ValueError, match="depends on itself"):
+        asyncio.run(scheduler.run())
+
+
+def test_dependents_of_failed_task_are_skipped():
+    async def main():
+        events = queue.Queue()
+        scheduler = TaskScheduler(poll_interval=0.01)
+        second, third = LoopTask("second", duration=0, events=events), LoopTask("third", duration=0, events=events)
+        scheduler.add(FailingTask("first", events=events))
+        scheduler.add(second, after=["first"])
+        scheduler.add(third, after=["second"])
+        report = await asyncio.wait_for(scheduler.run(), 3)
+        assert [report["tasks"][t]["outcome"] for t in ("first", "second", "third")] == ["failed", "skipped", "skipped"]
+        assert second.runs == 0 and third.runs == 0
+
+    asyncio.run(main())
+
+
+def test_cancelling_scheduler_hovers_running_tasks():
+    async def main():
+        scheduler = TaskScheduler(poll_interval=0.01)
+        task = LoopTask("a")
+        scheduler.add(task)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(scheduler.run(), 0.1)
+        assert task.runs == 1 and task.control.hovers == 1
+        assert scheduler.arbiter.holders[FC] is None
+
+    asyncio.run(main())
+
+
+def test_failing_node_cancels_siblings():
+    async def main():
+        events = queue.Queue()
+        scheduler = TaskScheduler(arbiter=ResourceArbiter(resources=[FC]), poll_interval=0.01)
+        sibling = LoopTask("sibling", events=events)
+        scheduler.add(sibling)
+        scheduler.add(LoopTask("bad", events=events), resources=(GIMBAL,))
+        with pytest.raises(ValueError, match="unknown resources"):
+            await asyncio.wait_for(scheduler.run(), 3)
+        assert scheduler.nodes["sibling"].run.cancelled()
+        assert sibling.control.hovers == 1
+
+    asyncio.run(main())